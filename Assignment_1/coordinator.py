@@ -3,21 +3,27 @@ Lamport's Mutual Exclusion Coordinator
 Manages node lifecycle and collects statistics
 """
 
-import xmlrpc.client
 import time
 import sys
 import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
-# Logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(processName)s] %(message)s",
-    datefmt="%d/%m/%Y %H:%M:%S",
-    handlers=[
-        logging.FileHandler("console.log", mode='a'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from peer_rpc import start_logging, call_peer
+
+def call_all_nodes(nodes, base_port, method):
+    """
+    Invoke an RPC method on every node in parallel.
+    Returns (node_id, result, error) tuples in node order.
+    """
+    def call(node_id):
+        try:
+            return node_id, call_peer(base_port, node_id, method), None
+        except Exception as e:
+            return node_id, None, e
+    
+    with ThreadPoolExecutor(max_workers=max(1, len(nodes))) as executor:
+        return list(executor.map(call, nodes))
 
 def wait_for_nodes(nodes, base_port, max_wait=30):
     """Wait for all nodes to be ready"""
@@ -34,11 +40,7 @@ def wait_for_nodes(nodes, base_port, max_wait=30):
         for node_id in nodes:
             if node_id not in ready_nodes:
                 try:
-                    proxy = xmlrpc.client.ServerProxy(
-                        f"http://localhost:{base_port + node_id}/",
-                        allow_none=True
-                    )
-                    response = proxy.ping()
+                    response = call_peer(base_port, node_id, 'ping')
                     if response['status'] == 'alive':
                         ready_nodes.add(node_id)
                         logging.info(f"Node-{node_id} is ready")
@@ -58,24 +60,20 @@ def collect_statistics(nodes, base_port):
     total_messages_sent = 0
     total_messages_received = 0
     
-    for node_id in nodes:
-        try:
-            proxy = xmlrpc.client.ServerProxy(
-                f"http://localhost:{base_port + node_id}/",
-                allow_none=True
-            )
-            stats = proxy.get_statistics()
-            all_stats[node_id] = stats
-            
-            total_messages_sent += stats['messages_sent']
-            total_messages_received += stats['messages_received']
-            
-            logging.info(f"Node-{node_id}: CS Entries={stats['cs_entries']}, "
-                        f"Messages Sent={stats['messages_sent']}, "
-                        f"Messages Received={stats['messages_received']}, "
-                        f"Final Clock={stats['lamport_clock']}")
-        except Exception as e:
-            logging.error(f"Failed to get stats from Node-{node_id}: {e}")
+    for node_id, stats, error in call_all_nodes(nodes, base_port, 'get_statistics'):
+        if error is not None:
+            logging.error(f"Failed to get stats from Node-{node_id}: {error}")
+            continue
+        
+        all_stats[node_id] = stats
+        
+        total_messages_sent += stats['messages_sent']
+        total_messages_received += stats['messages_received']
+        
+        logging.info(f"Node-{node_id}: CS Entries={stats['cs_entries']}, "
+                    f"Messages Sent={stats['messages_sent']}, "
+                    f"Messages Received={stats['messages_received']}, "
+                    f"Final Clock={stats['lamport_clock']}")
     
     return all_stats, total_messages_sent, total_messages_received
 
@@ -117,17 +115,23 @@ def generate_final_report(all_stats, total_messages_sent, total_messages_receive
         if stats['cs_start_time'] and stats['cs_end_time']:
             cs_times.append({
                 'node': node_id,
-                'start': stats['cs_start_time'],
-                'end': stats['cs_end_time']
+                'start': datetime.strptime(stats['cs_start_time'], '%H:%M:%S.%f'),
+                'end': datetime.strptime(stats['cs_end_time'], '%H:%M:%S.%f'),
+                'span': f"{stats['cs_start_time']} - {stats['cs_end_time']}"
             })
     
-    # Check for overlaps (simplified - assumes same-day execution)
+    # Sweep over CS intervals in entry order: each one must start no earlier
+    # than the previous one ended (assumes same-day execution)
+    cs_times.sort(key=lambda interval: interval['start'])
     overlaps = False
-    for i in range(len(cs_times)):
-        for j in range(i+1, len(cs_times)):
-            # This is a simplified check - in production, use proper datetime comparison
-            logging.info(f"Node-{cs_times[i]['node']}: {cs_times[i]['start']} - {cs_times[i]['end']}")
-            logging.info(f"Node-{cs_times[j]['node']}: {cs_times[j]['start']} - {cs_times[j]['end']}")
+    previous = None
+    for interval in cs_times:
+        logging.info(f"Node-{interval['node']}: {interval['span']}")
+        if previous is not None and interval['start'] < previous['end']:
+            overlaps = True
+            logging.info(f"  Overlaps with Node-{previous['node']}")
+        if previous is None or interval['end'] > previous['end']:
+            previous = interval
     
     if not overlaps:
         logging.info("✓ MUTUAL EXCLUSION VERIFIED: No overlapping CS executions detected")
@@ -156,16 +160,11 @@ def shutdown_nodes(nodes, base_port):
     """Shutdown all nodes gracefully"""
     logging.info("\n=== Shutting down all nodes ===")
     
-    for node_id in nodes:
-        try:
-            proxy = xmlrpc.client.ServerProxy(
-                f"http://localhost:{base_port + node_id}/",
-                allow_none=True
-            )
-            proxy.shutdown()
+    for node_id, _, error in call_all_nodes(nodes, base_port, 'shutdown'):
+        if error is None:
             logging.info(f"Shutdown signal sent to Node-{node_id}")
-        except Exception as e:
-            logging.error(f"Failed to shutdown Node-{node_id}: {e}")
+        else:
+            logging.error(f"Failed to shutdown Node-{node_id}: {error}")
     
     time.sleep(1)
 
@@ -176,6 +175,7 @@ if __name__ == "__main__":
     
     total_nodes = int(sys.argv[1])
     base_port = int(sys.argv[2])
+    start_logging()
     
     nodes = list(range(1, total_nodes + 1))
     
@@ -3,26 +3,20 @@ Lamport's Distributed Mutual Exclusion Node Server using XML-RPC.
 Implements distributed mutual exclusion with logical clocks.
 """
 
-from xmlrpc.server import SimpleXMLRPCServer
+from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
 from socketserver import ThreadingMixIn
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import threading
 import time
 import heapq
 import logging
 import os
+import contextlib
 from datetime import datetime
+from itertools import accumulate
 
-# Logging configuration - UNIFIED OUTPUT
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(processName)s] %(message)s",
-    datefmt="%d/%m/%Y %H:%M:%S",
-    handlers=[
-        logging.FileHandler("console.log", mode='a'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from peer_rpc import start_logging, call_peer, rpc_latency, rpc_latency_lock
 
 # Shutdown flag for graceful termination
 shutdown_flag = threading.Event()
@@ -30,10 +24,28 @@ shutdown_flag = threading.Event()
 # Global lock for atomic CS logging
 cs_log_lock = threading.Lock()
 
+# Shared worker pool for outbound RPCs and evidence file writes
+io_executor = ThreadPoolExecutor(max_workers=32)
+
+def format_cs_time(epoch_seconds):
+    """Format a CS entry/exit time as HH:MM:SS.mmm (None if not recorded)"""
+    if epoch_seconds is None:
+        return None
+    return datetime.fromtimestamp(epoch_seconds).strftime('%H:%M:%S.%f')[:-3]
+
 # ============================================================================
 # THREADED XML-RPC SERVER
 # ============================================================================
 
+class KeepAliveRequestHandler(SimpleXMLRPCRequestHandler):
+    """
+    Request handler that keeps the HTTP connection open between calls.
+    Responses are buffered so status line, headers and body leave in a
+    single send().
+    """
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+
 class ThreadedXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
     """Multi-threaded XML-RPC server"""
     daemon_threads = True
@@ -57,20 +69,25 @@ class LamportNode:
         self.lamport_clock = 0
         self.clock_lock = threading.Lock()
         
-        # Request queue (priority queue based on (timestamp, node_id))
+        # Request queue (priority queue based on (timestamp, node_id)).
+        # Entries are deleted lazily: pending_requests maps each node to its
+        # live request timestamp and stale heap entries are skipped on peek.
         self.request_queue = []
-        self.queue_lock = threading.Lock()
+        self.pending_requests = {}
         
         # Reply tracking
         self.replies_received = set()
-        self.reply_lock = threading.Lock()
+        
+        # Guards the request queue and replies_received; notified when either
+        # changes in a way that may let this node enter the CS
+        self.cs_condition = threading.Condition()
         
         # State
         self.requesting_cs = False
         self.in_cs = False
         self.my_request_timestamp = None
         
-        # CS execution tracking
+        # CS execution tracking (epoch seconds; formatted when reported)
         self.cs_entry_count = 0
         self.cs_start_time = None
         self.cs_end_time = None
@@ -80,60 +97,85 @@ class LamportNode:
         self.messages_received = 0
         
         # Clean up any existing evidence file
-        evidence_filename = f"cs_evidence_node_{self.node_id}.txt"
-        if os.path.exists(evidence_filename):
-            os.remove(evidence_filename)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(f"cs_evidence_node_{self.node_id}.txt")
         
         logging.info(f"[Node-{self.node_id}] Initialized")
         
-    def increment_clock(self):
-        """Increment Lamport clock"""
+    def increment_clock(self, ticks=1):
+        """
+        Increment Lamport clock.
+        ticks > 1 stamps consecutive local events under one lock acquisition;
+        the last of those timestamps is returned
+        """
         with self.clock_lock:
-            self.lamport_clock += 1
+            self.lamport_clock += ticks
             return self.lamport_clock
     
-    def update_clock(self, received_timestamp):
-        """Update clock based on received timestamp"""
+    def update_clock(self, received_timestamp, ticks=1):
+        """
+        Update clock based on received timestamp.
+        ticks > 1 also stamps the local events that immediately follow the
+        receive (e.g. sending a REPLY); the last timestamp is returned
+        """
         with self.clock_lock:
-            self.lamport_clock = max(self.lamport_clock, received_timestamp) + 1
+            self.lamport_clock = max(self.lamport_clock, received_timestamp) + ticks
             return self.lamport_clock
     
+    # ==================== Request Queue (caller holds cs_condition) ====================
+    
+    def _enqueue_request(self, timestamp, node_id):
+        """Add or replace a node's request in the queue"""
+        self.pending_requests[node_id] = timestamp
+        heapq.heappush(self.request_queue, (timestamp, node_id))
+    
+    def _dequeue_request(self, node_id):
+        """Remove a node's request; its heap entry is discarded lazily"""
+        self.pending_requests.pop(node_id, None)
+    
+    def _queue_head(self):
+        """Return the earliest live (timestamp, node_id) request, or None"""
+        while self.request_queue:
+            ts, nid = self.request_queue[0]
+            if self.pending_requests.get(nid) == ts:
+                return ts, nid
+            heapq.heappop(self.request_queue)
+        return None
+    
+    def _sorted_queue(self):
+        """Return the live requests in priority order"""
+        return sorted((ts, nid) for nid, ts in self.pending_requests.items())
+    
     # ==================== RPC Methods (Called by other nodes) ====================
     
     def request_critical_section(self, requesting_node_id, request_timestamp):
         """
         Handle REQUEST message from another node.
-        Add to queue and send REPLY back to the requester
+        Add to queue and send REPLY back to the requester.
+        Returns the bare reply timestamp to keep the XML-RPC response small
         """
         self.messages_received += 1
-        current_ts = self.update_clock(request_timestamp)
+        # One clock update covers both the receive and the REPLY send event
+        reply_ts = self.update_clock(request_timestamp, ticks=2)
         
         logging.info(f"[Node-{self.node_id}] Received REQUEST from Node-{requesting_node_id} with TS:{request_timestamp}")
         
         # Add request to queue
-        with self.queue_lock:
-            heapq.heappush(self.request_queue, (request_timestamp, requesting_node_id))
+        with self.cs_condition:
+            self._enqueue_request(request_timestamp, requesting_node_id)
         
         # Send REPLY back
-        reply_ts = self.increment_clock()
         logging.info(f"[Node-{self.node_id}] Sending REPLY to Node-{requesting_node_id} with TS:{reply_ts}")
         
-        # Send reply in separate thread with new proxy
-        threading.Thread(
-            target=self._send_reply_to_node_with_new_proxy,
-            args=(requesting_node_id, reply_ts),
-            daemon=True
-        ).start()
+        # Send reply from the worker pool over the pooled connection
+        io_executor.submit(self._send_reply_to_node, requesting_node_id, reply_ts)
         
-        return {'status': 'OK', 'timestamp': reply_ts}
+        return reply_ts
     
-    def _send_reply_to_node_with_new_proxy(self, node_id, reply_ts):
-        """Send REPLY message to a node using a NEW proxy instance"""
+    def _send_reply_to_node(self, node_id, reply_ts):
+        """Send REPLY message to a node"""
         try:
-            import xmlrpc.client
-            peer_url = f"http://localhost:{self.base_port + node_id}"
-            temp_proxy = xmlrpc.client.ServerProxy(peer_url, allow_none=True)
-            temp_proxy.receive_reply(self.node_id, reply_ts)
+            call_peer(self.base_port, node_id, 'receive_reply', self.node_id, reply_ts)
             self.messages_sent += 1
         except Exception as e:
             logging.error(f"[Node-{self.node_id}] Error sending REPLY to Node-{node_id}: {e}")
@@ -145,13 +187,14 @@ class LamportNode:
         
         logging.info(f"[Node-{self.node_id}] ✓ Received REPLY from Node-{replying_node_id} with TS:{reply_timestamp}")
         
-        with self.reply_lock:
+        with self.cs_condition:
             self.replies_received.add(replying_node_id)
             replies_count = len(self.replies_received)
+            self.cs_condition.notify_all()
         
         logging.info(f"[Node-{self.node_id}] Total replies: {replies_count}/{self.total_nodes-1}")
         
-        return {'status': 'OK', 'timestamp': current_ts}
+        return current_ts
     
     def release_critical_section(self, releasing_node_id, release_timestamp):
         """Handle RELEASE message from another node"""
@@ -161,12 +204,11 @@ class LamportNode:
         logging.info(f"[Node-{self.node_id}] Received RELEASE from Node-{releasing_node_id} with TS:{release_timestamp}")
         
         # Remove request from queue
-        with self.queue_lock:
-            self.request_queue = [(ts, nid) for ts, nid in self.request_queue 
-                                 if nid != releasing_node_id]
-            heapq.heapify(self.request_queue)
+        with self.cs_condition:
+            self._dequeue_request(releasing_node_id)
+            self.cs_condition.notify_all()
         
-        return {'status': 'OK', 'timestamp': current_ts}
+        return current_ts
     
     def ping(self):
         """Health check"""
@@ -174,14 +216,22 @@ class LamportNode:
     
     def get_statistics(self):
         """Return node statistics"""
+        # Non-empty log2(ns) buckets only; XML-RPC struct keys are strings
+        with rpc_latency_lock:
+            latency_histogram = {
+                method: {str(bucket): count for bucket, count in enumerate(histogram) if count}
+                for method, histogram in rpc_latency.items()
+            }
+        
         return {
             'node_id': self.node_id,
             'cs_entries': self.cs_entry_count,
             'messages_sent': self.messages_sent,
             'messages_received': self.messages_received,
             'lamport_clock': self.lamport_clock,
-            'cs_start_time': self.cs_start_time,
-            'cs_end_time': self.cs_end_time
+            'cs_start_time': format_cs_time(self.cs_start_time),
+            'cs_end_time': format_cs_time(self.cs_end_time),
+            'rpc_latency_histogram': latency_histogram
         }
     
     def shutdown(self):
@@ -214,7 +264,7 @@ class LamportNode:
         """Request to enter Critical Section"""
         self.requesting_cs = True
         
-        with self.reply_lock:
+        with self.cs_condition:
             self.replies_received.clear()
         
         # Generate unique request timestamp
@@ -222,36 +272,29 @@ class LamportNode:
         self.my_request_timestamp = req_ts
         
         # Add own request to queue
-        with self.queue_lock:
-            self.request_queue = [(ts, nid) for (ts, nid) in self.request_queue 
-                                 if nid != self.node_id]
-            heapq.heappush(self.request_queue, (self.my_request_timestamp, self.node_id))
-            queue_str = ', '.join([f"({ts},{nid})" for ts, nid in sorted(self.request_queue)])
+        with self.cs_condition:
+            self._enqueue_request(self.my_request_timestamp, self.node_id)
+            queue_str = ', '.join([f"({ts},{nid})" for ts, nid in self._sorted_queue()])
             logging.info(f"[Node-{self.node_id}] Queue: [{queue_str}]")
         
         # Send requests to all peers
-        import xmlrpc.client
-        for peer_id in range(1, self.total_nodes + 1):
-            if peer_id != self.node_id:
-                threading.Thread(
-                    target=self._send_request_to_peer,
-                    args=(peer_id, req_ts),
-                    daemon=True
-                ).start()
+        self._broadcast(self._send_request_to_peer, req_ts)
         
         logging.info(f"[Node-{self.node_id}] >>> REQUESTING Critical Section with TS:{self.my_request_timestamp}")
     
+    def _broadcast(self, send_fn, *args):
+        """Submit a message for every peer to the outbound worker pool"""
+        for peer_id in range(1, self.total_nodes + 1):
+            if peer_id != self.node_id:
+                io_executor.submit(send_fn, peer_id, *args)
+    
     def _send_request_to_peer(self, peer_id, req_ts):
         """Send request to a single peer"""
         try:
-            import xmlrpc.client
-            peer_url = f"http://localhost:{self.base_port + peer_id}"
-            proxy = xmlrpc.client.ServerProxy(peer_url, allow_none=True)
-            
             logging.info(f"[Node-{self.node_id}] Sending REQUEST to Node-{peer_id} with TS:{req_ts}")
-            response = proxy.request_critical_section(self.node_id, req_ts)
+            response_ts = call_peer(self.base_port, peer_id, 'request_critical_section', self.node_id, req_ts)
             self.messages_sent += 1
-            self.update_clock(response['timestamp'])
+            self.update_clock(response_ts)
         except Exception as e:
             logging.error(f"[Node-{self.node_id}] Error sending REQUEST to Node-{peer_id}: {e}")
     
@@ -259,37 +302,33 @@ class LamportNode:
         """Wait until conditions are met to enter CS"""
         logging.info(f"[Node-{self.node_id}] Waiting for CS entry conditions...")
         
-        check_count = 0
-        while True:
-            with self.reply_lock:
-                all_replies = len(self.replies_received) == (self.total_nodes - 1)
+        with self.cs_condition:
+            # Woken by REPLY/RELEASE; the timeout only paces progress logging
+            while not self.cs_condition.wait_for(self._can_enter_cs, timeout=1.0):
                 replies_count = len(self.replies_received)
-            
-            with self.queue_lock:
-                if len(self.request_queue) > 0:
-                    head_ts, head_nid = self.request_queue[0]
-                    at_head = (head_nid == self.node_id)
-                else:
-                    at_head = False
-                
-                sorted_queue = sorted(self.request_queue)
-                queue_str = ', '.join([f"({ts},{nid})" for ts, nid in sorted_queue[:3]])
-            
-            check_count += 1
-            if check_count % 10 == 0:
+                head = self._queue_head()
+                at_head = head is not None and head[1] == self.node_id
+                head_str = f"({head[0]},{head[1]})" if head is not None else "-"
                 logging.info(f"[Node-{self.node_id}] Checking: Replies={replies_count}/{self.total_nodes-1}, "
-                           f"At_head={at_head}, Queue={queue_str}")
-            
-            if all_replies and at_head:
-                logging.info(f"[Node-{self.node_id}] ✓✓✓ All conditions met! Entering CS...")
-                break
-            
-            time.sleep(0.1)
+                           f"At_head={at_head}, Head={head_str}")
+                
+                # Only pay for sorting the full queue when it will be logged
+                if logging.getLogger().isEnabledFor(logging.DEBUG):
+                    queue_str = ', '.join([f"({ts},{nid})" for ts, nid in self._sorted_queue()])
+                    logging.debug(f"[Node-{self.node_id}] Queue: [{queue_str}]")
+        
+        logging.info(f"[Node-{self.node_id}] ✓✓✓ All conditions met! Entering CS...")
+    
+    def _can_enter_cs(self):
+        """CS entry condition; caller must hold cs_condition"""
+        all_replies = len(self.replies_received) == (self.total_nodes - 1)
+        head = self._queue_head()
+        return all_replies and head is not None and head[1] == self.node_id
     
     def enter_cs(self):
         """Enter Critical Section"""
         self.cs_entry_count += 1
-        self.cs_start_time = datetime.now().strftime('%H:%M:%S.%f')[:-3]
+        self.cs_start_time = time.time()
         
         enter_ts = self.increment_clock()
         self.in_cs = True
@@ -298,32 +337,27 @@ class LamportNode:
         with cs_log_lock:
             logging.info(f"")
             logging.info(f"[Node-{self.node_id}] ========== ENTERING CRITICAL SECTION ==========")
-            logging.info(f"[Node-{self.node_id}] Entry Time: {self.cs_start_time} | Lamport TS: {enter_ts}")
+            logging.info(f"[Node-{self.node_id}] Entry Time: {format_cs_time(self.cs_start_time)} | Lamport TS: {enter_ts}")
         
         # Perform work
         self.execute_critical_section()
     
     def execute_critical_section(self):
         """Simulate critical section work"""
-        work_start_ts = self.increment_clock()
-        
-        # Collect all operations first, then log atomically
-        operations = []
-        result = 0
-        
-        for i in range(3):
-            operation_ts = self.increment_clock()
-            value = self.node_id * 100 + i * 10
-            result += value
-            operations.append({
-                'num': i+1,
-                'value': value,
-                'result': result,
-                'ts': operation_ts
-            })
-            time.sleep(0.3)
-        
-        work_end_ts = self.increment_clock()
+        # Work start, the operation batch and work end are consecutive
+        # local events; stamp all three with one clock update
+        work_end_ts = self.increment_clock(ticks=3)
+        work_start_ts = work_end_ts - 2
+        operation_ts = work_end_ts - 1
+        
+        # The three operations run as one batch under a single clock tick;
+        # collect them first, then log atomically
+        values = [self.node_id * 100 + i * 10 for i in range(3)]
+        operations = [
+            {'num': i + 1, 'value': value, 'result': running, 'ts': operation_ts}
+            for i, (value, running) in enumerate(zip(values, accumulate(values)))
+        ]
+        result = operations[-1]['result']
         
         # Log all CS work atomically
         with cs_log_lock:
@@ -332,30 +366,46 @@ class LamportNode:
                 logging.info(f"[Node-{self.node_id}]   Operation {op['num']}: +{op['value']} = {op['result']} [TS:{op['ts']}]")
             logging.info(f"[Node-{self.node_id}] Work Complete - Final Result: {result} [TS:{work_end_ts}]")
         
-        # Write evidence
-        self.write_cs_evidence(result, [f"Op{op['num']}:{op['value']}" for op in operations])
+        # Write evidence off the critical path, from a snapshot of CS state
+        io_executor.submit(
+            self.write_cs_evidence,
+            result,
+            [f"Op{op['num']}:{op['value']}" for op in operations],
+            datetime.now(),
+            self.lamport_clock,
+            self.my_request_timestamp
+        )
     
-    def write_cs_evidence(self, result, operations):
-        """Write evidence of CS execution to a file"""
+    def write_cs_evidence(self, result, operations, timestamp, lamport_clock, request_ts):
+        """Write evidence of CS execution to a file, replacing it atomically"""
         filename = f"cs_evidence_node_{self.node_id}.txt"
-        with open(filename, 'w') as f:
-            f.write(f"\n{'='*60}\n")
-            f.write(f"Node: {self.node_id}\n")
-            f.write(f"Timestamp: {datetime.now()}\n")
-            f.write(f"Lamport Clock: {self.lamport_clock}\n")
-            f.write(f"Request TS: {self.my_request_timestamp}\n")
-            f.write(f"Operations: {', '.join(operations)}\n")
-            f.write(f"Final Result: {result}\n")
-            f.write(f"{'='*60}\n")
+        temp_filename = f"{filename}.tmp"
+        try:
+            separator = '=' * 60
+            payload = (
+                f"\n{separator}\n"
+                f"Node: {self.node_id}\n"
+                f"Timestamp: {timestamp}\n"
+                f"Lamport Clock: {lamport_clock}\n"
+                f"Request TS: {request_ts}\n"
+                f"Operations: {', '.join(operations)}\n"
+                f"Final Result: {result}\n"
+                f"{separator}\n"
+            )
+            with open(temp_filename, 'w', buffering=8192) as f:
+                f.write(payload)
+            os.replace(temp_filename, filename)
+        except OSError as e:
+            logging.error(f"[Node-{self.node_id}] Error writing CS evidence: {e}")
     
     def exit_cs(self):
         """Exit Critical Section and send RELEASE"""
-        self.cs_end_time = datetime.now().strftime('%H:%M:%S.%f')[:-3]
+        self.cs_end_time = time.time()
         exit_ts = self.increment_clock()
         
         # Log exit atomically
         with cs_log_lock:
-            logging.info(f"[Node-{self.node_id}] Exit Time: {self.cs_end_time} | Lamport TS: {exit_ts}")
+            logging.info(f"[Node-{self.node_id}] Exit Time: {format_cs_time(self.cs_end_time)} | Lamport TS: {exit_ts}")
             logging.info(f"[Node-{self.node_id}] ========== EXITING CRITICAL SECTION ==========")
             logging.info(f"")
         
@@ -363,34 +413,21 @@ class LamportNode:
         self.requesting_cs = False
         
         # Remove own request from queue
-        with self.queue_lock:
-            self.request_queue = [(ts, nid) for ts, nid in self.request_queue 
-                                 if nid != self.node_id]
-            heapq.heapify(self.request_queue)
+        with self.cs_condition:
+            self._dequeue_request(self.node_id)
         
         # Send RELEASE to all peers
-        import xmlrpc.client
-        for peer_id in range(1, self.total_nodes + 1):
-            if peer_id != self.node_id:
-                threading.Thread(
-                    target=self._send_release_to_peer,
-                    args=(peer_id,),
-                    daemon=True
-                ).start()
+        self._broadcast(self._send_release_to_peer)
     
     def _send_release_to_peer(self, peer_id):
         """Send release to a single peer"""
         try:
-            import xmlrpc.client
-            peer_url = f"http://localhost:{self.base_port + peer_id}"
-            proxy = xmlrpc.client.ServerProxy(peer_url, allow_none=True)
-            
             release_ts = self.increment_clock()
             logging.info(f"[Node-{self.node_id}] Sending RELEASE to Node-{peer_id}")
             
-            response = proxy.release_critical_section(self.node_id, release_ts)
+            response_ts = call_peer(self.base_port, peer_id, 'release_critical_section', self.node_id, release_ts)
             self.messages_sent += 1
-            self.update_clock(response['timestamp'])
+            self.update_clock(response_ts)
         except Exception as e:
             logging.error(f"[Node-{self.node_id}] Error sending RELEASE to Node-{peer_id}: {e}")
 
@@ -406,6 +443,7 @@ def run_server(node_id, total_nodes, base_port, request_delay):
     server_port = base_port + node_id
     server = ThreadedXMLRPCServer(
         ('localhost', server_port),
+        requestHandler=KeepAliveRequestHandler,
         allow_none=True,
         logRequests=False
     )
@@ -428,12 +466,12 @@ def run_server(node_id, total_nodes, base_port, request_delay):
     # Execute CS cycle
     node.execute_cs_cycle()
     
-    # Wait for shutdown signal
-    while not shutdown_flag.is_set():
-        time.sleep(0.5)
+    # Block until the shutdown RPC sets the flag
+    shutdown_flag.wait()
     
     # Cleanup
     server.shutdown()
+    io_executor.shutdown(wait=False)
     logging.info(f"[Node-{node_id}] Server stopped")
 
 # ============================================================================
@@ -450,4 +488,5 @@ if __name__ == "__main__":
     base_port = int(sys.argv[3])
     request_delay = float(sys.argv[4])
     
+    start_logging()
     run_server(node_id, total_nodes, base_port, request_delay)
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Helpers shared by the Lamport nodes and the coordinator: the unified
+logging setup and pooled keep-alive XML-RPC proxies to the nodes.
+"""
+
+import xmlrpc.client
+import sys
+import threading
+import time
+import logging
+import queue
+import atexit
+import functools
+from logging.handlers import QueueHandler, QueueListener
+from array import array
+
+def start_logging():
+    """
+    Send all logging to console.log and stdout (UNIFIED OUTPUT).
+    Callers only enqueue formatted records; a single listener thread writes
+    them to the log file and console, off the RPC threads.
+    """
+    log_queue = queue.Queue(-1)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(processName)s] %(message)s",
+        datefmt="%d/%m/%Y %H:%M:%S",
+        handlers=[QueueHandler(log_queue)]
+    )
+    log_listener = QueueListener(
+        log_queue,
+        logging.FileHandler("console.log", mode='a'),
+        logging.StreamHandler(sys.stdout)
+    )
+    log_listener.start()
+    atexit.register(log_listener.stop)
+
+# Outbound RPC latency histograms: method -> 64 counters, where bucket b
+# counts calls that took [2**(b-1), 2**b) nanoseconds
+rpc_latency = {}
+rpc_latency_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def get_peer_proxy(base_port, peer_id):
+    """
+    Return the pooled (proxy, lock) pair for a peer, built on first use.
+    Two threads racing on the first call may each build a pair; only one
+    is cached and the other is simply used once.
+    """
+    proxy = xmlrpc.client.ServerProxy(
+        f"http://localhost:{base_port + peer_id}",
+        allow_none=True
+    )
+    return proxy, threading.Lock()
+
+def call_peer(base_port, peer_id, method, *args):
+    """
+    Invoke an RPC method on a peer through its pooled proxy.
+    The proxy's transport keeps its HTTP connection alive between calls,
+    so the per-peer lock serializes callers sharing that connection.
+    """
+    proxy, peer_lock = get_peer_proxy(base_port, peer_id)
+    with peer_lock:
+        start_ns = time.perf_counter_ns()
+        result = getattr(proxy, method)(*args)
+        elapsed_ns = time.perf_counter_ns() - start_ns
+    
+    record_rpc_latency(method, elapsed_ns)
+    return result
+
+def record_rpc_latency(method, elapsed_ns):
+    """Count one RPC round-trip in its method's log2 latency histogram"""
+    bucket = min(63, elapsed_ns.bit_length())
+    with rpc_latency_lock:
+        histogram = rpc_latency.get(method)
+        if histogram is None:
+            histogram = rpc_latency[method] = array('Q', [0] * 64)
+        histogram[bucket] += 1
@@ -9,8 +9,6 @@
 Launches all nodes and coordinator
 """
 
-import multiprocessing
-import subprocess
 import logging
 import time
 import sys
@@ -30,25 +28,25 @@ logging.basicConfig(
 BASE_PORT = 8000
 
 def launch_node(node_id, total_nodes, base_port, request_delay):
-    """Launch a single node process"""
+    """Spawn a single node process and return its pid"""
     logging.info(f"Launching Node-{node_id}")
-    subprocess.run([
-        "python3", "lamport_node.py",
+    return os.posix_spawn(sys.executable, [
+        sys.executable, "lamport_node.py",
         str(node_id),
         str(total_nodes),
         str(base_port),
         str(request_delay)
-    ])
+    ], os.environ)
 
 def launch_coordinator(total_nodes, base_port):
-    """Launch coordinator process"""
-    time.sleep(2)  # Wait for nodes to start
+    """Spawn the coordinator process and return its pid"""
+    # No start-up delay needed: the coordinator pings until every node is up
     logging.info("Launching Coordinator")
-    subprocess.run([
-        "python3", "coordinator.py",
+    return os.posix_spawn(sys.executable, [
+        sys.executable, "coordinator.py",
         str(total_nodes),
         str(base_port)
-    ])
+    ], os.environ)
 
 if __name__ == "__main__":
     print("\n" + "="*60)
@@ -88,32 +86,20 @@ if __name__ == "__main__":
     # Staggered delays to avoid simultaneous requests
     base_delays = [3.0, 4.0, 2.0, 3.5, 4.5, 2.5, 3.8, 4.2, 2.8, 3.2]
     
-    processes = []
+    pids = []
     
     # Launch all node processes
     for node_id in range(1, num_nodes + 1):
         delay = base_delays[(node_id - 1) % len(base_delays)]
-        p = multiprocessing.Process(
-            target=launch_node,
-            args=(node_id, num_nodes, BASE_PORT, delay),
-            name=f"Node-{node_id}"
-        )
-        processes.append(p)
-        p.start()
+        pids.append(launch_node(node_id, num_nodes, BASE_PORT, delay))
         time.sleep(0.3)
     
     # Launch coordinator
-    coordinator_process = multiprocessing.Process(
-        target=launch_coordinator,
-        args=(num_nodes, BASE_PORT),
-        name="Coordinator"
-    )
-    coordinator_process.start()
+    pids.append(launch_coordinator(num_nodes, BASE_PORT))
     
     # Wait for all processes
-    for p in processes:
-        p.join()
-    coordinator_process.join()
+    for pid in pids:
+        os.waitpid(pid, 0)
     
     logging.info("Simulation complete.")
     print("\n" + "="*80)
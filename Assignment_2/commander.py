@@ -1,97 +1,148 @@
 # commander.py
 import xmlrpc.client
+import asyncio
+from collections import Counter
 import time
 import sys
 import logging
 
-# Logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(processName)s] %(message)s",
-    datefmt= "%d/%m/%Y %H:%M:%S",
-    # Added handlers list to include both the file and console stream
-    handlers=[
-        logging.FileHandler("console.log", mode='a'), # Use 'a' for append
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
-def build_lieutenant_nodes(count):
-    return {f"Lieutenant-{i+1}": {"port": 8001 + i} for i in range(count)}
-
-def send_order(order, nodes):
-    for name, config in nodes.items():
-        proxy = xmlrpc.client.ServerProxy(f"http://localhost:{config['port']}/", allow_none=True)
-        proxy.receive_order("Commander", order)
-        logging.info(f"Sent '{order}' to {name}") 
-
-def forward_orders(nodes):
-    for sender_name, sender_config in nodes.items():
-        sender_proxy = xmlrpc.client.ServerProxy(f"http://localhost:{sender_config['port']}/", allow_none=True)
-        commander_order = sender_proxy.get_order_from("Commander")
-        for receiver_name, receiver_config in nodes.items():
-            if receiver_name != sender_name:
-                receiver_proxy = xmlrpc.client.ServerProxy(f"http://localhost:{receiver_config['port']}/", allow_none=True)
-                receiver_proxy.receive_order(sender_name, commander_order)
-                logging.info(f"{sender_name} forwarded '{commander_order}' to {receiver_name}")
-
-def collect_decisions(nodes):
-    decisions = {}
+from node import start_logging, socket_path, ORDERS
+
+logger = logging.getLogger(__name__)
+
+def build_lieutenant_nodes(count, socket_dir):
+    return {name: {"socket": socket_path(socket_dir, name)}
+            for name in (f"Lieutenant-{i+1}" for i in range(count))}
+
+async def open_connections(nodes, timeout=5):
+    # One kept-alive connection per lieutenant, retried until its socket
+    # accepts. Returns {name: (reader, writer)} for every lieutenant that
+    # accepted; after the timeout the rest get one try each.
+    deadline = time.monotonic() + timeout
+    connections = {}
     for name, config in nodes.items():
-        proxy = xmlrpc.client.ServerProxy(f"http://localhost:{config['port']}/", allow_none=True)
-        decision = proxy.decide_order()
-        decisions[name] = decision
-    
+        while name not in connections:
+            try:
+                connections[name] = await asyncio.open_unix_connection(config["socket"])
+            except OSError:
+                if time.monotonic() > deadline:
+                    logger.error("Timeout waiting for %s to start", name)
+                    break
+                await asyncio.sleep(0.01)
+    return connections
+
+async def close_connections(connections):
+    for reader, writer in connections.values():
+        writer.close()
+        await writer.wait_closed()
+
+async def call(connection, method, *params):
+    # A single XML-RPC call over HTTP/1.1 on an open connection
+    reader, writer = connection
+    body = xmlrpc.client.dumps(params, method, allow_none=True).encode()
+    writer.write(b"POST /RPC2 HTTP/1.1\r\nHost: localhost\r\nContent-Type: text/xml\r\n"
+                 b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+    await writer.drain()
+
+    status_line, *header_lines = (await reader.readuntil(b"\r\n\r\n")).decode("iso-8859-1").split("\r\n")
+    headers = {key.strip().lower(): value.strip()
+               for key, _, value in (line.partition(":") for line in header_lines if line)}
+    status = int(status_line.split()[1])
+    # Lieutenants answer every call with a Content-Length body and keep the
+    # connection open. Anything else leaves the connection unusable, so close
+    # it; shutdown_nodes reconnects to stop that lieutenant.
+    if (status != 200 or "content-length" not in headers
+            or headers.get("connection", "").lower() == "close"):
+        writer.close()
+        raise xmlrpc.client.ProtocolError(method, status, status_line, headers)
+    response = await reader.readexactly(int(headers["content-length"]))
+    (result,), _ = xmlrpc.client.loads(response)  # raises Fault on error
+    return result
+
+async def run_round(order, connections):
+    # Each lieutenant relays the order to its peers itself and returns its
+    # decision. A call only returns once that lieutenant has heard from all
+    # of its peers, so every call must be in flight at the same time.
+    peers = list(connections)
+
+    async def run(name, connection):
+        logger.info("Sent '%s' to %s", order, name) 
+        return await call(connection, "run_round", order, peers)
+
+    # Let every call finish before raising, so no request is still in
+    # flight on a connection when shutdown_nodes reuses it
+    decisions = await asyncio.gather(*(run(name, connection) for name, connection in connections.items()),
+                                     return_exceptions=True)
+    for decision in decisions:
+        if isinstance(decision, Exception):
+            raise decision
+    return dict(zip(connections, decisions))
+
+def report_decisions(decisions):
     # Analyze majority decision
     decision_votes = list(decisions.values())
     if decision_votes:
-        # Count votes for each decision
-        vote_count = {}
-        for vote in decision_votes:
-            vote_count[vote] = vote_count.get(vote, 0) + 1
-        
-        # Find majority decision
-        majority_decision = max(vote_count.keys(), key=lambda x: vote_count[x])
-        majority_count = vote_count[majority_decision]
+        # Count votes for each decision and find the majority
+        vote_count = Counter(decision_votes)
+        majority_decision, majority_count = vote_count.most_common(1)[0]
         total_nodes = len(decision_votes)
         
-        logging.info(f"\n=== BYZANTINE AGREEMENT FINAL RESULT ===")
-        logging.info(f"Individual decisions: {decisions}")
-        logging.info(f"Vote count: {vote_count}")
-        logging.info(f"Majority decision: {majority_decision} ({majority_count}/{total_nodes} nodes)")
-        logging.info(f"Consensus achieved: {'YES' if majority_count > total_nodes/2 else 'NO'}")
-        logging.info(f"==========================================")
+        logger.info("\n=== BYZANTINE AGREEMENT FINAL RESULT ===")
+        logger.info("Individual decisions: %s", decisions)
+        logger.info("Vote count: %s", dict(vote_count))
+        logger.info("Majority decision: %s (%s/%s nodes)", majority_decision, majority_count, total_nodes)
+        logger.info("Consensus achieved: %s", 'YES' if majority_count > total_nodes/2 else 'NO')
+        logger.info("==========================================")
         
         print(f"\n=== BYZANTINE AGREEMENT FINAL RESULT ===")
         print(f"Individual decisions: {decisions}")
-        print(f"Vote count: {vote_count}")
+        print(f"Vote count: {dict(vote_count)}")
         print(f"Majority decision: {majority_decision} ({majority_count}/{total_nodes} nodes)")
         print(f"Consensus achieved: {'YES' if majority_count > total_nodes/2 else 'NO'}")
         print(f"==========================================\n")
     
     return decisions
 
-def shutdown_nodes(nodes):
-    for name, config in nodes.items():
-        proxy = xmlrpc.client.ServerProxy(f"http://localhost:{config['port']}/", allow_none=True)
+async def shutdown_nodes(nodes, connections):
+    async def shutdown(name):
         try:
-            proxy.shutdown()
+            if connections[name][1].is_closing():
+                # call() gave up on this connection, but the node still runs
+                connections[name] = await asyncio.open_unix_connection(nodes[name]["socket"])
+            await call(connections[name], "shutdown")
         except Exception:
             pass
 
+    await asyncio.gather(*(shutdown(name) for name in connections))
+    # Close the kept-alive connections to the departing nodes
+    await close_connections(connections)
+
+async def command(count, order, socket_dir):
+    # The whole round runs on one event loop thread
+    nodes = build_lieutenant_nodes(count, socket_dir)
+    connections = await open_connections(nodes)
+    try:
+        # Only run the round once every lieutenant is reachable
+        if len(connections) == len(nodes):
+            logger.info("Commander initiating order: %s", order) 
+            report_decisions(await run_round(order, connections))
+    finally:
+        # Stop every lieutenant that started, even if the round failed or
+        # never ran
+        await shutdown_nodes(nodes, connections)
+
+def run_commander(count, order, socket_dir):
+    asyncio.run(command(count, order, socket_dir))
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python commander.py <NumberOfLieutenants> <Order>") 
+    if len(sys.argv) != 4:
+        print("Usage: python commander.py <NumberOfLieutenants> <Order> <SocketDir>") 
         sys.exit(1)
 
-    count = int(sys.argv[1])
     order = sys.argv[2].upper()
-    NODES = build_lieutenant_nodes(count)
-
-    logging.info(f"Commander initiating order: {order}") 
-    send_order(order, NODES)
-    time.sleep(1)
-    forward_orders(NODES)
-    time.sleep(1)
-    collect_decisions(NODES)
-    shutdown_nodes(NODES)
\ No newline at end of file
+    if order not in ORDERS:
+        print(f"Order must be one of: {', '.join(ORDERS)}")
+        sys.exit(1)
+
+    start_logging()
+    run_commander(int(sys.argv[1]), order, sys.argv[3])
\ No newline at end of file
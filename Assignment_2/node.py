@@ -4,69 +4,234 @@ Byzantine Agreement Node Server using XML-RPC.
 Supports Commander and Lieutenants with Byzantine fault simulation.
 """
 
-from xmlrpc.server import SimpleXMLRPCServer
+from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+from socketserver import ThreadingMixIn
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
 import sys
+import os
+import socket
+import struct
+import hashlib
 import threading
 import logging
+import queue
+import atexit
 
-# Logging configuration
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(processName)s] %(message)s",
-    datefmt= "%d/%m/%Y %H:%M:%S",
-    # Added handlers list to include both the file and console stream
-    handlers=[
-        logging.FileHandler("console.log", mode='a'), # Use 'a' for append
+def start_logging():
+    # Logging configuration: callers only enqueue formatted records and a
+    # single listener thread writes them to the log file and console
+    log_queue = queue.Queue(-1)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(threadName)s] %(message)s",
+        datefmt= "%d/%m/%Y %H:%M:%S",
+        handlers=[QueueHandler(log_queue)]
+    )
+    log_listener = QueueListener(
+        log_queue,
+        logging.FileHandler("console.log", mode='a'),
         logging.StreamHandler(sys.stdout)
-    ]
-)
+    )
+    log_listener.start()
+    atexit.register(log_listener.stop)
 
-shutdown_flag = threading.Event()
+# Messages use %-style arguments so they are only formatted when the record
+# is actually emitted
+logger = logging.getLogger(__name__)
+
+class KeepAliveRequestHandler(SimpleXMLRPCRequestHandler):
+    # HTTP/1.1 lets the commander reuse one connection for all its calls
+    protocol_version = "HTTP/1.1"
+    # SimpleXMLRPCRequestHandler turns this on, but setting TCP_NODELAY
+    # fails on UNIX-domain sockets
+    disable_nagle_algorithm = False
+    # Buffer each response so headers and body go out in a single write
+    wbufsize = -1
+
+    def address_string(self):
+        # UNIX-domain peers have no address; name the socket in error logs
+        return self.server.server_address
+
+class ThreadingXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
+    # One handler thread per connection, so a slow client cannot stall the rest.
+    # Every node is local, so it listens on a UNIX-domain socket rather than
+    # going through the TCP loopback stack.
+    address_family = socket.AF_UNIX
+    daemon_threads = True
+
+    def process_request_thread(self, request, client_address):
+        # Name the handler thread after its node, so log lines carry its tag
+        threading.current_thread().name = self.instance.node_id
+        super().process_request_thread(request, client_address)
+
+# sun_path holds 108 bytes, including the terminating NUL
+SOCKET_PATH_MAX = 107
+
+def socket_path(socket_dir, node_id):
+    return os.path.join(socket_dir, f"{node_id}.sock")
+
+def remove_stale_socket(path):
+    # Only remove a socket file nobody is listening on. A live node's socket
+    # is left alone, so binding to it fails with EADDRINUSE.
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+# How long a lieutenant waits in run_round for its peers' orders
+ROUND_TIMEOUT = 5
+
+# Lieutenants relay their copy of the order to all peers with one multicast
+# datagram: a token for the run, the sender's name (NUL-padded) and an index
+# into ORDERS. Every run on the host shares the group, so the token keeps
+# one run's echoes out of another's vote.
+ECHO_GROUP = ("239.1.1.1", 9000)
+ORDERS = ("ATTACK", "RETREAT")
+NAME_SIZE = 32
+ECHO = struct.Struct(f"!8s{NAME_SIZE}sB")
+
+def run_token(socket_dir):
+    # Each run has its own socket directory
+    return hashlib.blake2b(os.path.realpath(socket_dir).encode(), digest_size=8).digest()
+
+def open_echo_socket():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    # Every lieutenant on this host binds the same group port
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    # Bind the group address, not INADDR_ANY, so unicast datagrams sent to
+    # this port never reach the listener
+    sock.bind(ECHO_GROUP)
+    loopback = socket.inet_aton("127.0.0.1")
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, socket.inet_aton(ECHO_GROUP[0]) + loopback)
+    # Send over loopback only, and deliver to listeners on this host
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, loopback)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 0)
+    # Lets listen_for_echoes check between datagrams whether the node stopped
+    sock.settimeout(0.5)
+    return sock
 
 class Node:
-    def __init__(self, node_id, is_byzantine=False):
+    def __init__(self, node_id, run_id, is_byzantine=False):
+        # A longer name would be cut short in every echo and never match
+        if len(node_id.encode()) > NAME_SIZE:
+            raise ValueError(f"Node name {node_id!r} is longer than {NAME_SIZE} bytes")
         self.node_id = node_id
+        self.run_id = run_id
         self.is_byzantine = is_byzantine
         self.received_orders = {}
+        # Handlers run on per-connection threads; run_round waits on this
+        # for its peers' orders to arrive
+        self.orders_cond = threading.Condition()
+        # Attached by run_server so the shutdown RPC can stop it
+        self.server = None
+        self.echo_socket = open_echo_socket()
+        # Set by run_server once the server has stopped
+        self.stopped = threading.Event()
 
     def receive_order(self, sender_id, order):
-        logging.info(f"[Node {self.node_id}] Received '{order}' from {sender_id}") 
+        logger.info("[Node %s] Received '%s' from %s", self.node_id, order, sender_id) 
         if self.is_byzantine:
             order = "RETREAT" if order == "ATTACK" else "ATTACK"
-            logging.info(f"[Node {self.node_id}] Byzantine behavior: flipped to '{order}'") 
-        self.received_orders[sender_id] = order
-        return True
+            logger.info("[Node %s] Byzantine behavior: flipped to '%s'", self.node_id, order) 
+        with self.orders_cond:
+            self.received_orders[sender_id] = order
+            self.orders_cond.notify_all()
+        # The stored (possibly flipped) order is what this node will relay
+        return order
+
+    def listen_for_echoes(self):
+        # Record every peer's multicast copy until the node stops. The
+        # socket is closed here rather than by run_server, so its descriptor
+        # cannot be reused while this thread is still reading from it.
+        with self.echo_socket:
+            while not self.stopped.is_set():
+                try:
+                    # One spare byte so oversized datagrams show up as such
+                    data, _ = self.echo_socket.recvfrom(ECHO.size + 1)
+                except TimeoutError:
+                    continue
+                # Drop anything that is not a well-formed echo
+                if len(data) != ECHO.size:
+                    continue
+                try:
+                    run_id, sender, order_index = ECHO.unpack(data)
+                    sender_id = sender.rstrip(b"\0").decode()
+                    order = ORDERS[order_index]
+                except (struct.error, IndexError, UnicodeDecodeError):
+                    continue
+                if run_id == self.run_id and sender_id != self.node_id:
+                    self.receive_order(sender_id, order)
+
+    def run_round(self, order, peers):
+        # Take the commander's order, multicast the stored copy to every
+        # peer, then decide once each peer's copy has arrived
+        stored_order = self.receive_order("Commander", order)
+        others = [peer for peer in peers if peer != self.node_id]
+
+        self.echo_socket.sendto(ECHO.pack(self.run_id, self.node_id.encode(), ORDERS.index(stored_order)), ECHO_GROUP)
+        logger.info("[Node %s] Forwarded '%s' to %s", self.node_id, stored_order, ", ".join(others))
+
+        # Only the commander and this round's peers get a vote, so an echo
+        # from any other sender neither ends the wait nor counts
+        voters = {"Commander", *others}
+        with self.orders_cond:
+            if not self.orders_cond.wait_for(lambda: voters <= self.received_orders.keys(), timeout=ROUND_TIMEOUT):
+                logger.warning("[Node %s] Timed out waiting for peers; deciding on %s orders", self.node_id, len(voters & self.received_orders.keys()))
+        return self.decide_order(voters)
 
     def get_order_from(self, sender_id):
-        return self.received_orders.get(sender_id, "UNKNOWN")
+        with self.orders_cond:
+            return self.received_orders.get(sender_id, "UNKNOWN")
 
-    def decide_order(self):
-        votes = list(self.received_orders.values())
-        decision = max(set(votes), key=votes.count)
-        logging.info(f"[Node {self.node_id}] Final decision: {decision}") 
+    def decide_order(self, senders=None):
+        # Majority over the orders received from senders (default: everyone)
+        with self.orders_cond:
+            votes = [order for sender_id, order in self.received_orders.items()
+                     if senders is None or sender_id in senders]
+        decision = Counter(votes).most_common(1)[0][0]
+        logger.info("[Node %s] Final decision: %s", self.node_id, decision) 
         return decision
 
     def shutdown(self):
-        logging.info(f"[Node {self.node_id}] Shutting down...") 
-        shutdown_flag.set()
+        logger.info("[Node %s] Shutting down...", self.node_id) 
+        # server.shutdown() blocks until serve_forever() returns, so it must
+        # not run on this request's handler thread
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
         return True
 
-def run_server(node_id, port, is_byzantine=False):
-    node = Node(node_id, is_byzantine)
-    server = SimpleXMLRPCServer(("localhost", port), allow_none=True, logRequests=False) 
+def run_server(node_id, socket_dir, is_byzantine=False):
+    node = Node(node_id, run_token(socket_dir), is_byzantine)
+    path = socket_path(socket_dir, node_id)
+    # Clear a socket file left behind by a crashed run
+    remove_stale_socket(path)
+    server = ThreadingXMLRPCServer(path, requestHandler=KeepAliveRequestHandler, allow_none=True, logRequests=False) 
     server.register_instance(node)
-    logging.info(f"[Node {node_id}] Started on port {port} (Byzantine: {is_byzantine})") 
+    node.server = server
+    threading.Thread(target=node.listen_for_echoes, name=node_id, daemon=True).start()
+    logger.info("[Node %s] Started on %s (Byzantine: %s)", node_id, path, is_byzantine) 
 
-    while not shutdown_flag.is_set():
-        server.handle_request()
+    # Returns once the shutdown RPC has stopped the server. shutdown() waits
+    # for the next poll, so keep the interval short.
+    server.serve_forever(poll_interval=0.05)
+    server.server_close()
+    os.unlink(path)
+    node.stopped.set()
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("Usage: python node.py <NodeName> <Port> [byzantine]")
+        print("Usage: python node.py <NodeName> <SocketDir> [byzantine]")
         sys.exit(1)
 
     name = sys.argv[1]
-    port = int(sys.argv[2])
+    socket_dir = sys.argv[2]
     is_byzantine = len(sys.argv) == 4 and sys.argv[3].lower() == "byzantine"
 
-    run_server(name, port, is_byzantine)
\ No newline at end of file
+    start_logging()
+    run_server(name, socket_dir, is_byzantine)
\ No newline at end of file
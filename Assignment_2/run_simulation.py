@@ -1,34 +1,22 @@
 # run_simulation.py
-import multiprocessing
-import subprocess
+import threading
+import tempfile
 import logging
-import time
 import sys
+import os
 
-# Logging configruation
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(processName)s] %(message)s",
-    datefmt= "%d/%m/%Y %H:%M:%S",
-    # Added handlers list to include both the file and console stream
-    handlers=[
-        logging.FileHandler("console.log"),
-        # Writing output to terminal
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from node import run_server, start_logging, socket_path, SOCKET_PATH_MAX
+from commander import run_commander
 
-def launch_node(name, port, is_byzantine=False):
-    logging.info(f"Launching {name} on port {port}")
-    args = ["python3", "node.py", name, str(port)]
-    if is_byzantine:
-        args.append("byzantine")
-    subprocess.run(args) 
+logger = logging.getLogger(__name__)
 
-def launch_commander(count, order):
-    time.sleep(2)
-    logging.info("Launching Commander")
-    subprocess.run(["python3", "commander.py", str(count), order])
+def launch_node(name, socket_dir, is_byzantine=False):
+    logger.info("Launching %s on %s", name, socket_path(socket_dir, name))
+    run_server(name, socket_dir, is_byzantine)
+
+def launch_commander(count, order, socket_dir):
+    logger.info("Launching Commander")
+    run_commander(count, order, socket_dir)
 
 if __name__ == "__main__":
     print("\n" + "="*60)
@@ -37,7 +25,7 @@ if __name__ == "__main__":
     print("="*60)
     print("\nWhat this script does:")
     print("1. Get User input for number of lieutenants, Byzantine nodes, and commander's order")
-    print("2. Launches all lieutenants and commander processes")
+    print("2. Launches all lieutenants and the commander as threads of this process")
     print("3. Each lieutenant participates in a single round of the Byzantine Agreement Protocol")
     print("4. Lieutenants communicate via RPC to reach consensus")
     print("5. Logs all messages and decisions in console.log")
@@ -75,23 +63,34 @@ if __name__ == "__main__":
             break
         print("Invalid order. Please enter either 'ATTACK' or 'RETREAT'.") 
 
-    processes = []
+    start_logging()
+    # A private directory for this run's lieutenant sockets
+    socket_dir = tempfile.mkdtemp(prefix="byz-")
+    # A long TMPDIR can push socket paths past the AF_UNIX limit. Check them
+    # all before starting anything, so no run is left half started.
+    too_long = [path for path in (socket_path(socket_dir, f"Lieutenant-{i+1}") for i in range(count))
+                if len(os.fsencode(path)) > SOCKET_PATH_MAX]
+    if too_long:
+        os.rmdir(socket_dir)
+        print(f"Socket path {too_long[0]} is longer than {SOCKET_PATH_MAX} bytes. Set TMPDIR to a shorter directory.")
+        sys.exit(1)
+    threads = []
     for i in range(count):
         name = f"Lieutenant-{i+1}"
-        port = 8001 + i
         is_byzantine = i in byzantine_indices
-        p = multiprocessing.Process(target=launch_node, args=(name, port, is_byzantine), name=name)
-        processes.append(p)
-        p.start()
+        t = threading.Thread(target=launch_node, args=(name, socket_dir, is_byzantine), name=name)
+        threads.append(t)
+        t.start()
 
-    commander_process = multiprocessing.Process(target=launch_commander, args=(count, order), name="Commander")
-    commander_process.start()
+    commander_thread = threading.Thread(target=launch_commander, args=(count, order, socket_dir), name="Commander")
+    commander_thread.start()
 
-    for p in processes:
-        p.join()
-    commander_process.join()
+    for t in threads:
+        t.join()
+    commander_thread.join()
+    os.rmdir(socket_dir)
 
-    logging.info("Simulation complete.")
+    logger.info("Simulation complete.")
     # Keep final print statements for clear completion message on terminal
     print("\n ==== Simulation complete. All processes finished. ====")
     print(" ==== Check 'console.log' for full output. ====")